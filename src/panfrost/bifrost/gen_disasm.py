@@ -39,6 +39,28 @@ def reserved_masks(op):
     masks = [reserved_mask(m) for m in op[2].get("derived", [])]
     return [m for m in masks if m[2] != 0]
 
+# Decoder for a single execution unit, generating the checks in order.
+# Compiled once and shared between the FMA and ADD units.
+
+decode_op_template = Template("""void
+bi_disasm_${unit}(FILE *fp, unsigned bits, struct bifrost_regs *srcs, struct bifrost_regs *next_regs, unsigned staging_register, unsigned branch_offset, struct bi_constants *consts, bool last)
+{
+% for (i, (name, (emask, ebits), derived)) in enumerate(options):
+% if len(derived) > 0:
+    ${"else " if i > 0 else ""}if (unlikely(((bits & ${hex(emask)}) == ${hex(ebits)})
+% for (pos, width, reserved) in derived:
+        && !(${hex(reserved)} & (1 << _BITS(bits, ${pos}, ${width})))
+% endfor
+    ))
+% else:
+    ${"else " if i > 0 else ""}if (unlikely(((bits & ${hex(emask)}) == ${hex(ebits)})))
+% endif
+        bi_disasm_${name}(fp, bits, srcs, next_regs, staging_register, branch_offset, consts, last);
+% endfor
+    else
+        fprintf(fp, "INSTR_INVALID_ENC ${unit} %X\\n", bits);
+}""")
+
 # To decode instructions, pattern match based on the rules:
 #
 # 1. Execution unit (FMA or ADD) must line up.
@@ -62,27 +84,7 @@ def decode_op(instructions, is_fma):
     # Map to what we need to template
     mapped = [(opname_to_c(op), instructions[op][2]["exact"], reserved_masks(instructions[op])) for op in options]
 
-    # Generate checks in order
-    template = """void
-bi_disasm_${unit}(FILE *fp, unsigned bits, struct bifrost_regs *srcs, struct bifrost_regs *next_regs, unsigned staging_register, unsigned branch_offset, struct bi_constants *consts, bool last)
-{
-% for (i, (name, (emask, ebits), derived)) in enumerate(options):
-% if len(derived) > 0:
-    ${"else " if i > 0 else ""}if (unlikely(((bits & ${hex(emask)}) == ${hex(ebits)})
-% for (pos, width, reserved) in derived:
-        && !(${hex(reserved)} & (1 << _BITS(bits, ${pos}, ${width})))
-% endfor
-    ))
-% else:
-    ${"else " if i > 0 else ""}if (unlikely(((bits & ${hex(emask)}) == ${hex(ebits)})))
-% endif
-        bi_disasm_${name}(fp, bits, srcs, next_regs, staging_register, branch_offset, consts, last);
-% endfor
-    else
-        fprintf(fp, "INSTR_INVALID_ENC ${unit} %X\\n", bits);
-}"""
-
-    return Template(template).render(options = mapped, unit = "fma" if is_fma else "add")
+    return decode_op_template.render(options = mapped, unit = "fma" if is_fma else "add")
 
 # Decoding emits a series of function calls to e.g. `fma_fadd_v2f16`. We need to
 # emit functions to disassemble a single decoded instruction in a particular